@@ -6,13 +6,175 @@ Uses OpenClaw CLI to send messages via WhatsApp.
 This works when running via OpenClaw cron or manually.
 """
 
+import atexit
+import collections
+import functools
+import logging
+import math
 import os
+import queue
+import re
+import shutil
 import subprocess
 import sys
+import threading
+import time
+from concurrent.futures import Future
+from typing import List, Optional, Tuple
 
-def send_notification(message: str):
+# Child of sync.py's logger, so notification lines land in sync.log too
+log = logging.getLogger('airbnb-wyze-sync.notifications')
+
+
+_E164 = re.compile(r'^\+?[1-9]\d{7,14}$')
+
+
+def _normalize_phone(phone_number: str) -> str:
+    """
+    Canonical E.164 form (+15551234567) of NOTIFICATION_NUMBER
+    
+    Spaces, dashes, dots and parentheses are ignored. Returns '' when unset
+    or invalid, so a bad number disables sending up front instead of
+    failing inside openclaw on every message.
+    """
+    phone_number = re.sub(r'[\s().-]', '', phone_number)
+    if not phone_number:
+        return ''
+    if not _E164.match(phone_number):
+        log.warning(f"⚠️  Invalid NOTIFICATION_NUMBER '{phone_number}', notifications disabled")
+        return ''
+    return '+' + phone_number.lstrip('+')
+
+
+def _positive_setting(name: str, default, cast=float):
+    """
+    Read a numeric env setting that must be a finite number > 0
+    
+    Invalid or non-positive values log a warning and fall back to the
+    default, so a typo degrades to default behaviour instead of breaking
+    every send (or the import itself).
+    """
+    raw = os.getenv(name, '')
+    if not raw:
+        return default
+    try:
+        value = cast(raw)
+    except ValueError:
+        value = None
+    if value is None or not (value > 0 and math.isfinite(value)):
+        log.warning(f"⚠️  Invalid {name} '{raw}', using default {default}")
+        return default
+    return value
+
+
+# Notification target, read once at import
+_PHONE = _normalize_phone(os.getenv('NOTIFICATION_NUMBER', ''))
+
+# One long-lived worker drains queued messages so sync.py never waits on
+# the openclaw CLI (startup + WhatsApp round-trip) inline.
+_queue: "queue.Queue[Tuple[str, Future]]" = queue.Queue(maxsize=256)
+_worker: Optional[threading.Thread] = None
+_worker_lock = threading.Lock()
+
+# Optional OpenClaw HTTP endpoint; when set, messages are POSTed over a
+# pooled keep-alive connection instead of running the CLI per message
+_HTTP_URL = os.getenv('OPENCLAW_HTTP', '')
+_session = None
+
+# Token bucket to stay under WhatsApp's anti-abuse throttle during bursts
+_RATE_PER_SEC = _positive_setting('NOTIFICATION_RATE_PER_SEC', 1.0)
+_BURST = _positive_setting('NOTIFICATION_BURST', 5.0)
+_bucket = {'tokens': _BURST, 'ts': time.monotonic()}
+_bucket_lock = threading.Lock()
+
+
+def _take_token():
+    """Block until the rate limiter allows one more send"""
+    with _bucket_lock:
+        now = time.monotonic()
+        _bucket['tokens'] = min(_BURST, _bucket['tokens'] + (now - _bucket['ts']) * _RATE_PER_SEC)
+        _bucket['ts'] = now
+        if _bucket['tokens'] < 1:
+            time.sleep((1 - _bucket['tokens']) / _RATE_PER_SEC)
+            _bucket['tokens'] = 1.0
+            _bucket['ts'] = time.monotonic()
+        _bucket['tokens'] -= 1
+
+
+# Circuit breaker: after N consecutive failed sends, skip openclaw for a
+# cooldown instead of paying a full timeout per message while it is down
+_CB_THRESHOLD = _positive_setting('NOTIFICATION_FAILURE_THRESHOLD', 3, int)
+_CB_COOLDOWN = _positive_setting('NOTIFICATION_COOLDOWN_SEC', 60.0)
+_cb = {'fails': 0, 'open_until': 0.0}
+
+
+# Identical messages within this window are dropped (WhatsApp rejects repeats)
+_DEDUP_WINDOW = _positive_setting('NOTIFICATION_DEDUP_SEC', 30.0)
+_DEDUP_MAX = 1024
+_recent: "collections.OrderedDict[int, float]" = collections.OrderedDict()
+_recent_lock = threading.Lock()
+
+
+def _is_duplicate(message: str) -> bool:
+    """Check (and remember) whether this exact message was sent recently"""
+    key = hash(message)
+    now = time.monotonic()
+    with _recent_lock:
+        # Entries are in send order, so expired ones sit at the front
+        while _recent and next(iter(_recent.values())) < now - _DEDUP_WINDOW:
+            _recent.popitem(last=False)
+        if key in _recent:
+            return True
+        _recent[key] = now
+        if len(_recent) > _DEDUP_MAX:
+            _recent.popitem(last=False)
+        return False
+
+
+def _drain():
+    """Worker loop: send queued messages one at a time, in order"""
+    while True:
+        message, future = _queue.get()
+        try:
+            _deliver(message, future)
+        finally:
+            _queue.task_done()
+
+
+def _deliver(message: str, future: Future):
+    """Send a message and resolve its future; errors never reach the caller"""
+    try:
+        future.set_result(_send_now(message))
+    except Exception as e:
+        log.warning(f"⚠️  WhatsApp send error: {e}")
+        log.warning(f"   Message: {message[:80]}...")
+        future.set_result(False)
+
+
+def _ensure_worker():
+    """Start the worker thread on first use (flushes pending sends at exit)"""
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = threading.Thread(target=_drain, name="notifications", daemon=True)
+            _worker.start()
+            atexit.register(_queue.join)
+
+
+def _send_disabled(message: str) -> Future:
+    """send_notification when NOTIFICATION_NUMBER is unset: log only"""
+    log.info("📱 No NOTIFICATION_NUMBER set, logging only:")
+    log.info(f"   {message}")
+    future: Future = Future()
+    future.set_result(False)
+    return future
+
+
+def _send_enabled(message: str) -> Future:
     """
-    Send WhatsApp notification using OpenClaw CLI
+    Queue a WhatsApp notification for the background worker
+    
+    Bound as send_notification when NOTIFICATION_NUMBER is set.
     
     This function is called by sync.py when:
     - New booking codes are created
@@ -27,56 +189,193 @@ def send_notification(message: str):
     Example messages:
     - "🔑 New lock code for GuestName\nCode: 6354\nDates: 2026-02-01 to 2026-04-16\nType: 📱 Phone-based"
     - "🔑 New lock code for GuestName\nCode: 6454\nDates: 2026-04-16 to 2026-04-17\nType: ⚠️ GENERATED (notify guest!)"
+    
+    Returns immediately with a Future that resolves to True once the
+    message was delivered (False if it was only logged). Queued messages
+    are sent in order and flushed before the process exits.
     """
     
-    phone_number = os.getenv('NOTIFICATION_NUMBER', '')
-    if not phone_number:
-        print(f"📱 No NOTIFICATION_NUMBER set, logging only:")
-        print(f"   {message}")
-        return
+    future: Future = Future()
+    if _is_duplicate(message):
+        log.info(f"📱 Duplicate notification within {_DEDUP_WINDOW:.0f}s, deduped")
+        future.set_result(False)
+        return future
     
-    # Use OpenClaw CLI to send message
+    _ensure_worker()
     try:
-        # Ensure phone number has + prefix
-        if not phone_number.startswith('+'):
-            phone_number = '+' + phone_number
+        _queue.put_nowait((message, future))
+    except queue.Full:
+        # Worker is backed up - send inline rather than drop the message
+        _deliver(message, future)
+    return future
+
+
+# Resolved once at import: with no number configured every call is log-only
+send_notification = _send_enabled if _PHONE else _send_disabled
+
+
+class NotificationBatcher:
+    """
+    Collect notifications and send them as a single WhatsApp message
+    
+    The openclaw CLI sends one message per invocation, so a sync run that
+    touches several bookings pays CLI startup + WhatsApp round-trip once
+    instead of once per change. sync.py wraps process_changes() and
+    cleanup_old_codes() in one of these.
+    
+    Usage:
+        with NotificationBatcher() as batch:
+            batch.add("🗑️ Cancelled: Removed code 6354 for GuestName")
+            batch.add("🔑 New lock code for OtherGuest...")
+        # -> one message, sections separated by a blank line
+    """
+    
+    def __init__(self):
+        self.messages: List[str] = []
+    
+    def __enter__(self) -> "NotificationBatcher":
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        # Flush even on error - lock changes made before it still went through
+        self.flush()
+        return False
+    
+    def add(self, message: str):
+        """Add a message to the batch"""
+        self.messages.append(message)
+    
+    def flush(self) -> Optional[Future]:
+        """Send everything collected so far as one message"""
+        if not self.messages:
+            return None
+        message = "\n\n".join(self.messages)
+        self.messages = []
+        return send_notification(message)
+
+
+def _get_session():
+    """Shared HTTP session so every send reuses one keep-alive connection"""
+    global _session
+    if _session is None:
+        import requests
+        from requests.adapters import HTTPAdapter
         
-        # Build the command
-        cmd = [
-            'openclaw', 'message', 'send',
-            '--channel', 'whatsapp',
-            '--target', phone_number,
-            '--message', message
-        ]
+        _session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1)
+        _session.mount('http://', adapter)
+        _session.mount('https://', adapter)
+    return _session
+
+
+def _send_now(message: str) -> bool:
+    """Send one WhatsApp message via OpenClaw (runs on the worker)"""
+    phone_number = _PHONE
+    
+    # Circuit open: openclaw kept failing, don't wait on it again yet
+    if time.monotonic() < _cb['open_until']:
+        log.info("📱 Notifications paused after repeated failures, logging only:")
+        log.info(f"   {message}")
+        return False
+    
+    _take_token()
+    if _HTTP_URL:
+        sent = _send_http(phone_number, message)
+    else:
+        sent = _send_cli(phone_number, message)
+    
+    if sent:
+        _cb['fails'] = 0
+    else:
+        _cb['fails'] += 1
+        if _cb['fails'] >= _CB_THRESHOLD:
+            _cb['open_until'] = time.monotonic() + _CB_COOLDOWN
+            _cb['fails'] = 0
+            log.warning(f"⚠️  {_CB_THRESHOLD} failed sends in a row, pausing notifications for {_CB_COOLDOWN:.0f}s")
+    return sent
+
+
+def _send_http(phone_number: str, message: str) -> bool:
+    """POST the message to the OpenClaw HTTP endpoint (OPENCLAW_HTTP)"""
+    import requests
+    
+    try:
+        response = _get_session().post(
+            _HTTP_URL,
+            json={"channel": "whatsapp", "target": phone_number, "message": message},
+            timeout=30
+        )
+        response.raise_for_status()
+    except requests.RequestException as e:
+        log.warning(f"⚠️  WhatsApp send error: {e}")
+        log.warning(f"   Message: {message[:80]}...")
+        return False
+    
+    log.info(f"📱 WhatsApp notification sent to {phone_number}")
+    return True
+
+
+# Fixed part of the CLI invocation; only target and message vary
+_CMD_ARGS = ('message', 'send', '--channel', 'whatsapp', '--target')
+
+
+@functools.lru_cache(maxsize=1)
+def _openclaw_bin() -> Optional[str]:
+    """Absolute path of the openclaw CLI, resolved once"""
+    return shutil.which('openclaw')
+
+
+def _send_cli(phone_number: str, message: str) -> bool:
+    """
+    Send the message by running the OpenClaw CLI
+    
+    The CLI is started with an absolute path and close_fds=False so CPython
+    can use posix_spawn instead of fork+exec, which avoids copying the
+    parent's page tables on every send.
+    
+    Tradeoff: close_fds=False means inheritable fds are passed to openclaw.
+    fds Python opens itself are non-inheritable (PEP 446), but any
+    inheritable fds this process was started with (e.g. from cron, systemd
+    or a wrapper script) leak into the child.
+    """
+    try:
+        # Build the command (bare name if not on PATH -> FileNotFoundError)
+        cmd = [_openclaw_bin() or 'openclaw', *_CMD_ARGS, phone_number, '--message', message]
         
-        # Run the command
+        # Only stderr is ever read, and only on failure
         result = subprocess.run(
             cmd,
-            capture_output=True,
-            text=True,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            close_fds=False,
             timeout=30
         )
         
         if result.returncode == 0:
-            print(f"📱 WhatsApp notification sent to {phone_number}")
-        else:
-            print(f"⚠️  Failed to send WhatsApp: {result.stderr}")
-            print(f"   Message: {message[:80]}...")
+            log.info(f"📱 WhatsApp notification sent to {phone_number}")
+            return True
+        
+        log.warning(f"⚠️  Failed to send WhatsApp: {result.stderr.decode('utf-8', 'replace').strip()}")
+        log.warning(f"   Message: {message[:80]}...")
             
     except FileNotFoundError:
         # openclaw CLI not found
-        print(f"📱 openclaw CLI not found, logging message:")
-        print(f"   To: {phone_number}")
-        print(f"   {message}")
+        log.info("📱 openclaw CLI not found, logging message:")
+        log.info(f"   To: {phone_number}")
+        log.info(f"   {message}")
         
     except subprocess.TimeoutExpired:
-        print(f"⚠️  WhatsApp send timed out")
+        log.warning("⚠️  WhatsApp send timed out")
         
-    except Exception as e:
-        print(f"⚠️  WhatsApp send error: {e}")
-        print(f"   Message: {message[:80]}...")
+    except OSError as e:
+        # Spawn/pipe failures (permissions, BrokenPipeError, ...)
+        log.warning(f"⚠️  WhatsApp send error: {e}")
+        log.warning(f"   Message: {message[:80]}...")
+    
+    return False
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
     # Test the notification
-    send_notification("🔑 Test notification from Airbnb-Wyze Lock Sync")
+    send_notification("🔑 Test notification from Airbnb-Wyze Lock Sync").result()
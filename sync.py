@@ -14,45 +14,131 @@ import os
 import re
 import hashlib
 import sys
-from datetime import datetime, timedelta
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from functools import lru_cache
 from pathlib import Path
 from typing import Dict, Any, List, Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
-# Fix for Python 3.12+ distutils removal (wyze-sdk dependency requires distutils)
-# This hack may need updates for future Python versions
+# Heavy dependencies (requests, icalendar, wyze-sdk) are imported where
+# they're first used, so --help and no-op runs don't pay for them
 try:
-    import distutils
-except ImportError:
-    import setuptools
-    sys.modules['distutils'] = setuptools._distutils
-
-try:
-    import icalendar
-    import requests
     from dotenv import load_dotenv
 except ImportError:
-    import subprocess
-    subprocess.run(["pip", "install", "icalendar", "requests", "python-dotenv"])
-    import icalendar
-    import requests
-    from dotenv import load_dotenv
+    raise SystemExit("❌ Missing dependencies. Run: pip install -r requirements.txt")
 
 # Load environment variables from .env file
 load_dotenv()
 
+# iCal DESCRIPTION markers: located with str.find, only the short value
+# after them is examined
+_PHONE_PREFIX = 'Phone Number (Last 4 Digits):'
+_RESERVATION_PREFIX = '/details/'
+_RESERVATION_ID_RE = re.compile(r'[A-Z0-9]+')
+
+# Lightweight iCal scanning (see AirbnbWyzeSync._scan_ical_events)
+_ICAL_FOLD_RE = re.compile(r'\r?\n[ \t]')
+_VEVENT_RE = re.compile(r'BEGIN:VEVENT\r?\n(.*?)END:VEVENT', re.S)
+_ICAL_PROP_RE = re.compile(r'^([A-Z][A-Z0-9-]*)((?:;[^:\r\n]*)?):(.*?)\r?$', re.M)
+_ICAL_DATE_RE = re.compile(r'^\d{8}$')
+_ICAL_ESCAPE_RE = re.compile(r'\\([\\;,nN])')
+# Blocked-date SUMMARY: contains "not available"/"blocked", is just
+# "Airbnb", or starts with "Airbnb (" - one case-insensitive scan
+_BLOCKED_SUMMARY_RE = re.compile(r'not available|blocked|^airbnb \(|^\s*airbnb\s*\Z', re.I)
+_ICAL_SUMMARY_RE = re.compile(r'^SUMMARY(?:;[^:\r\n]*)?:(.*?)\r?$', re.M)
+
+
+def _unescape_ical_char(match) -> str:
+    """Undo RFC 5545 TEXT escaping (\\n \\, \\; \\\\)"""
+    char = match.group(1)
+    return "\n" if char in "nN" else char
+
+
+def _install_distutils_shim():
+    """Make `import distutils` work for wyze-sdk on Python 3.12+"""
+    # Fix for Python 3.12+ distutils removal (wyze-sdk dependency requires distutils)
+    # This hack may need updates for future Python versions
+    try:
+        import distutils
+    except ImportError:
+        import setuptools
+        sys.modules['distutils'] = setuptools._distutils
+
+
+# wyze-sdk names used on every add/remove. Bound once by _import_wyze_sdk()
+# at login, so the SDK stays out of --help and no-op runs
+WyzeApiError = LockKeyPermission = LockKeyPermissionType = None
+
+
+def _import_wyze_sdk():
+    """Import wyze-sdk's error and lock permission classes (first call only)"""
+    global WyzeApiError, LockKeyPermission, LockKeyPermissionType
+    if WyzeApiError is None:
+        _install_distutils_shim()
+        from wyze_sdk.errors import WyzeApiError
+        from wyze_sdk.models.devices.locks import LockKeyPermission, LockKeyPermissionType
+
+
+@lru_cache(maxsize=8)
+def _get_zone(name: str) -> Optional[ZoneInfo]:
+    """ZoneInfo for a timezone name, or None if unknown (looked up once per name)"""
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return None
+
+
+def _is_blocked_summary(summary: str) -> bool:
+    """True for blocked dates and other non-reservation events"""
+    # These include "Not available", "Airbnb (Not available)", etc.
+    return _BLOCKED_SUMMARY_RE.search(summary) is not None
+
+
+class _CachedTimeFormatter(logging.Formatter):
+    """Formatter that reuses the formatted timestamp for records in the same second"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._cached_time = (None, "")  # (whole second, formatted string)
+    
+    def formatTime(self, record, datefmt=None):
+        second = int(record.created)
+        cached_second, formatted = self._cached_time
+        if second != cached_second:
+            formatted = super().formatTime(record, datefmt)
+            self._cached_time = (second, formatted)
+        return formatted
+
+
 class AirbnbWyzeSync:
-    def __init__(self, dry_run: bool = False):
+    def __init__(self, dry_run: bool = False, serial: bool = False):
         self.base_dir = Path(__file__).parent
         self.state_file = self.base_dir / "bookings_state.json"
+        self.api_state_file = self.base_dir / "api_state.json"  # API key warnings sent
         self.log_file = self.base_dir / "sync.log"
         self.dry_run = dry_run
+        self.serial = serial  # Apply lock changes one at a time (debugging)
         
         self.config = self._load_config()
         self.lock_api = None  # Lazy initialization
+        self._notification_batch = None  # Set inside batched_notifications()
+        self._notify_number = os.getenv('NOTIFICATION_NUMBER', '')
+        self._send_notification = None  # notifications.send_notification, bound on first use
+        self._api_key_expires = None  # Parsed on first check
+        self._api_key_next_check = 0.0  # time.monotonic() of next expiry check
+        self._ical_not_modified = False  # Last fetch got 304 Not Modified
+        self._ical_validators = {}  # ETag/Last-Modified to persist in state
         
         self._setup_logging()
         self.ensure_directories()
         
+        # Lock's timezone (validated by _load_config)
+        self._tz = _get_zone(self.config["timezone"])
+        
         if self.dry_run:
             self.log("🧪 DRY RUN MODE - No changes will be made to Wyze lock")
     
@@ -63,6 +149,9 @@ class AirbnbWyzeSync:
         
         # Avoid adding duplicate handlers if called multiple times
         if not self.logger.handlers:
+            # One shared formatter so each second's timestamp is formatted once
+            formatter = _CachedTimeFormatter('%(asctime)s - %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+            
             # File handler with rotation
             file_handler = logging.handlers.RotatingFileHandler(
                 self.log_file,
@@ -70,12 +159,12 @@ class AirbnbWyzeSync:
                 backupCount=3,
                 encoding='utf-8'
             )
-            file_handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s', datefmt='%Y-%m-%d %H:%M:%S'))
+            file_handler.setFormatter(formatter)
             self.logger.addHandler(file_handler)
             
             # Also log to stdout
             console_handler = logging.StreamHandler()
-            console_handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s', datefmt='%Y-%m-%d %H:%M:%S'))
+            console_handler.setFormatter(formatter)
             self.logger.addHandler(console_handler)
     
     def get_lock_api(self):
@@ -86,21 +175,56 @@ class AirbnbWyzeSync:
     
     def send_whatsapp_notification(self, message: str):
         """Send WhatsApp notification when codes change"""
-        notification_number = os.getenv('NOTIFICATION_NUMBER', '')
-        if not notification_number:
+        if not self._notify_number:
+            return
+        
+        if self._notification_batch is not None:
+            self._notification_batch.add(message)
             return
         
         # Use notifications.py module (handles OpenClaw integration)
         try:
-            from notifications import send_notification
-            send_notification(message)
-            self.log(f"📱 Notification sent")
+            if self._send_notification is None:
+                from notifications import send_notification
+                self._send_notification = send_notification
+            # Sending happens on the notifications worker - log the outcome
+            # once it's known, not when the message is queued
+            self._send_notification(message).add_done_callback(self._log_notification_result)
         except Exception as e:
             # Fallback: log the message so it's visible in OpenClaw logs
             self.log(f"📱 Notification: {message[:80]}...")
             if "No module named" not in str(e):
                 self.log(f"   (Error: {e})")
     
+    def _log_notification_result(self, future):
+        """Done-callback for send_notification's Future"""
+        if future.exception() is None and future.result():
+            self.log("📱 Notification sent")
+        else:
+            self.log("📱 Notification not sent (logged only)")
+    
+    @contextmanager
+    def batched_notifications(self):
+        """Group notifications sent inside the block into one WhatsApp message"""
+        try:
+            from notifications import NotificationBatcher
+        except Exception as e:
+            # Notification problems must never block lock syncing - fall
+            # back to unbatched sends (which log instead of raising)
+            if not isinstance(e, ImportError):
+                self.log(f"⚠️  Notifications unavailable, not batching: {e}")
+            yield
+            return
+        
+        with NotificationBatcher() as batch:
+            self._notification_batch = batch
+            try:
+                yield
+            finally:
+                self._notification_batch = None
+            if batch.messages:
+                self.log(f"📱 Sending {len(batch.messages)} notification(s) as one message")
+    
     def ensure_directories(self):
         """Setup required directories"""
         self.log_file.parent.mkdir(exist_ok=True)
@@ -153,52 +277,85 @@ class AirbnbWyzeSync:
         if missing:
             raise ValueError(f"Missing required environment variables: {', '.join(missing)}")
         
+        if _get_zone(config["timezone"]) is None:
+            raise ValueError(f"Unknown TIMEZONE '{config['timezone']}' (use an IANA name like America/Chicago)")
+        
+        # Check-in/out times are parsed here (to datetime.time) so a typo is
+        # reported as a config error, not as a Wyze connection failure
+        for key, env_name in (("check_in_time", "CHECK_IN_TIME"), ("check_out_time", "CHECK_OUT_TIME")):
+            try:
+                config[key] = datetime.strptime(config[key], '%H:%M').time()
+            except ValueError:
+                raise ValueError(f"Invalid {env_name} '{config[key]}' (use 24-hour HH:MM, e.g. 16:00)")
+        
         return config
     
+    def _parse_api_key_expiration(self):
+        """Parse WYZE_API_KEY_EXPIRES once (None if unparseable)"""
+        if self._api_key_expires is not None:
+            return self._api_key_expires
+        
+        expires_str = self.config.get("api_key_expires", "")
+        
+        # Parse expiration date (try common formats)
+        expires_dt = None
+        formats = [
+            "%Y-%m-%d",           # 2027-02-04
+            "%Y-%m-%d %H:%M:%S",  # 2027-02-04 01:41:34
+            "%m-%d-%Y",           # 02-04-2027
+            "%m-%d-%Y %H:%M:%S",  # 02-04-2027 01:41:34
+        ]
+        
+        for fmt in formats:
+            try:
+                expires_dt = datetime.strptime(expires_str.strip(), fmt)
+                break
+            except ValueError:
+                continue
+        
+        if not expires_dt:
+            self.log(f"⚠️  Could not parse API key expiration date: {expires_str}")
+            return None
+        
+        # Make timezone-aware
+        self._api_key_expires = expires_dt.replace(tzinfo=self._tz)
+        return self._api_key_expires
+    
     def check_api_key_expiration(self):
         """Check if Wyze API key is expiring soon and send warnings"""
         expires_str = self.config.get("api_key_expires", "")
         if not expires_str:
             return
         
+        # Nothing can change before the next warning threshold (set below)
+        if time.monotonic() < self._api_key_next_check:
+            return
+        
         try:
-            # Parse expiration date (try common formats)
-            expires_dt = None
-            formats = [
-                "%Y-%m-%d",           # 2027-02-04
-                "%Y-%m-%d %H:%M:%S",  # 2027-02-04 01:41:34
-                "%m-%d-%Y",           # 02-04-2027
-                "%m-%d-%Y %H:%M:%S",  # 02-04-2027 01:41:34
-            ]
-            
-            for fmt in formats:
-                try:
-                    expires_dt = datetime.strptime(expires_str.strip(), fmt)
-                    break
-                except ValueError:
-                    continue
-            
-            if not expires_dt:
-                self.log(f"⚠️  Could not parse API key expiration date: {expires_str}")
+            expires_dt = self._parse_api_key_expiration()
+            if expires_dt is None:
+                self._api_key_next_check = float('inf')  # Logged once, don't retry
                 return
-            
-            # Make timezone-aware
-            tz_name = self.config.get('timezone', 'America/Chicago')
-            try:
-                import pytz
-                tz = pytz.timezone(tz_name)
-                expires_dt = tz.localize(expires_dt)
-                now = datetime.now(tz)
-            except Exception:
-                now = datetime.now()
+            now = datetime.now(self._tz)
             
             # Calculate time until expiration
             time_until = expires_dt - now
             days_until = time_until.days
             
+            # Recheck in at most an hour, or halfway to the next threshold
+            next_threshold = next((d for d in (30, 7, 1, -1) if days_until > d), None)
+            recheck = 3600.0
+            if next_threshold is not None:
+                until_threshold = (time_until - timedelta(days=next_threshold + 1)).total_seconds()
+                recheck = min(recheck, max(until_threshold, 0) / 2)
+            self._api_key_next_check = time.monotonic() + recheck
+            
+            # More than a month out: no warning due, skip the state file entirely
+            if days_until > 30:
+                return
+            
             # Load state to track which warnings have been sent
-            state = self.load_bookings_state()
-            api_warnings = state.get("api_key_warnings", {})
+            api_warnings = self.load_api_state().get("api_key_warnings", {})
             
             # Determine warning level and message
             warning_sent = False
@@ -254,12 +411,30 @@ class AirbnbWyzeSync:
             
             # Save warning state if we sent something
             if warning_sent:
-                state["api_key_warnings"] = api_warnings
-                self.save_bookings_state(state)
+                self.save_api_state({"api_key_warnings": api_warnings})
                 
         except Exception as e:
             self.log(f"⚠️  Error checking API key expiration: {e}")
     
+    def load_api_state(self) -> Dict[str, Any]:
+        """Load API key warning state (kept apart from the bookings state)"""
+        if self.api_state_file.exists():
+            try:
+                with open(self.api_state_file) as f:
+                    return json.load(f)
+            except json.JSONDecodeError:
+                self.log("⚠️  Corrupted API state file, using empty state")
+                return {}
+        # Older versions kept the warnings inside bookings_state.json
+        return {"api_key_warnings": self.load_bookings_state().get("api_key_warnings", {})}
+    
+    def save_api_state(self, state: Dict[str, Any]):
+        """Save API key warning state without rewriting the bookings state"""
+        tmp_file = self.api_state_file.with_suffix('.tmp')
+        with open(tmp_file, 'w') as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_file, self.api_state_file)
+    
     def load_bookings_state(self) -> Dict[str, Any]:
         """Load previous bookings state for change detection"""
         if self.state_file.exists():
@@ -273,24 +448,69 @@ class AirbnbWyzeSync:
     def save_bookings_state(self, state: Dict[str, Any]):
         """Save current bookings state for diffing"""
         state["last_sync"] = datetime.now().isoformat()
-        with open(self.state_file, 'w') as f:
+        # Write to a temp file and rename over the old one, so a crash
+        # mid-write can never leave a truncated state file behind
+        tmp_file = self.state_file.with_suffix('.tmp')
+        with open(tmp_file, 'w') as f:
             json.dump(state, f, indent=2)
+        os.replace(tmp_file, self.state_file)
     
-    def fetch_current_bookings(self) -> Dict[str, Dict[str, Any]]:
-        """Fetch current bookings from Airbnb"""
+    def fetch_current_bookings(self, state: Optional[Dict[str, Any]] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Fetch current bookings from Airbnb
+        
+        Sends the ETag/Last-Modified saved in state as a conditional GET. On
+        304 Not Modified, or a body byte-identical to the last one (sha256),
+        the stored bookings are returned unparsed and self._ical_not_modified
+        is set. The first fetch of each day is unconditional, so upstream
+        drift the validators missed is still picked up.
+        """
+        self._ical_not_modified = False
         if not self.config["ical_url"]:
             self.log("❌ Missing AIRBNB_ICAL_URL - set in .env file")
             return {}
         
+        import requests
+        
+        previous_bookings = (state or {}).get("bookings", {})
+        today = date.today().isoformat()
+        revalidate = bool(previous_bookings) and state.get("ical_full_sync") == today
+        headers = {}
+        if revalidate:
+            if state.get("ical_etag"):
+                headers["If-None-Match"] = state["ical_etag"]
+            if state.get("ical_last_modified"):
+                headers["If-Modified-Since"] = state["ical_last_modified"]
+        
         try:
-            response = requests.get(self.config["ical_url"], timeout=30)
-            response.raise_for_status()
+            # Read the body in 64KB chunks (requests already asks for gzip)
+            with requests.get(self.config["ical_url"], headers=headers, timeout=30, stream=True) as response:
+                response.raise_for_status()
+                if response.status_code == 304:
+                    self._ical_not_modified = True
+                    return previous_bookings
+                
+                ical_bytes = b"".join(response.iter_content(chunk_size=64 * 1024))
+                content_hash = hashlib.sha256(ical_bytes).hexdigest()
+                self._ical_validators = {
+                    "ical_etag": response.headers.get("ETag"),
+                    "ical_last_modified": response.headers.get("Last-Modified"),
+                    "ical_sha256": content_hash,
+                    "ical_full_sync": today,
+                }
         except Exception as e:
             self.log(f"❌ Failed to fetch iCal: {e}")
             return {}
         
+        # Server ignored the validators but sent the same feed again
+        if revalidate and content_hash == state.get("ical_sha256"):
+            self._ical_not_modified = True
+            return previous_bookings
+        
         try:
-            return self._parse_ical(response.text)
+            # iCal is always UTF-8 (RFC 5545) - decode once ourselves instead
+            # of letting requests guess the charset from the whole body
+            return self._parse_ical(ical_bytes.decode('utf-8', 'replace'))
         except Exception as e:
             self.log(f"❌ Failed to parse iCal: {e}")
             return {}
@@ -299,78 +519,152 @@ class AirbnbWyzeSync:
         """Extract last 4 digits of phone number from iCal DESCRIPTION"""
         if not description:
             return None
+        if not isinstance(description, str):
+            description = str(description)
         # Look for "Phone Number (Last 4 Digits): XXXX"
-        match = re.search(r'Phone Number \(Last 4 Digits\):\s*(\d{4})', str(description))
-        if match:
-            return match.group(1)
+        pos = description.find(_PHONE_PREFIX)
+        while pos >= 0:
+            start = pos + len(_PHONE_PREFIX)
+            end = len(description)
+            while start < end and description[start].isspace():
+                start += 1
+            digits = description[start:start + 4]
+            if len(digits) == 4 and digits.isdecimal():
+                return digits
+            pos = description.find(_PHONE_PREFIX, pos + 1)
         return None
     
     def _extract_reservation_id(self, description: str) -> Optional[str]:
         """Extract reservation ID from iCal DESCRIPTION"""
         if not description:
             return None
+        if not isinstance(description, str):
+            description = str(description)
         # Look for reservation ID in URL like: /details/HMKHCAK3M3
-        match = re.search(r'/details/([A-Z0-9]+)', str(description))
-        if match:
-            return match.group(1)
+        pos = description.find(_RESERVATION_PREFIX)
+        while pos >= 0:
+            match = _RESERVATION_ID_RE.match(description, pos + len(_RESERVATION_PREFIX))
+            if match:
+                return match.group()
+            pos = description.find(_RESERVATION_PREFIX, pos + 1)
         return None
     
-    def _parse_ical(self, ical_data: str) -> Dict[str, Dict[str, Any]]:
-        """Parse iCal data into structured bookings"""
+    def _scan_ical_events(self, ical_data: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        Pull the VEVENT properties we use straight out of the raw iCal text
+        
+        Airbnb feeds only contain all-day DTSTART/DTEND and a few text
+        properties, so a regex scan avoids building a full icalendar tree.
+        Returns None if the feed has anything this scan doesn't handle
+        (timed/TZID dates, nested components) - caller falls back to icalendar.
+        """
+        data = _ICAL_FOLD_RE.sub('', ical_data)  # Unfold RFC 5545 continuation lines
+        events = []
+        
+        for match in _VEVENT_RE.finditer(data):
+            block = match.group(1)
+            if 'BEGIN:' in block:
+                return None  # Nested VALARM etc.
+            
+            # Most Airbnb events are blocked dates - drop them before
+            # parsing any other property
+            summary = _ICAL_SUMMARY_RE.search(block)
+            if summary and _is_blocked_summary(_ICAL_ESCAPE_RE.sub(_unescape_ical_char, summary.group(1))):
+                continue
+            
+            props: Dict[str, Any] = {}
+            for name, params, value in _ICAL_PROP_RE.findall(block):
+                if name in props:
+                    continue
+                if name in ("DTSTART", "DTEND"):
+                    if 'TZID' in params or not _ICAL_DATE_RE.match(value):
+                        return None
+                    try:
+                        props[name] = date(int(value[:4]), int(value[4:6]), int(value[6:8]))
+                    except ValueError:
+                        pass  # Left out -> skipped as malformed below
+                elif name in ("SUMMARY", "UID", "DESCRIPTION"):
+                    props[name] = _ICAL_ESCAPE_RE.sub(_unescape_ical_char, value)
+            events.append(props)
+        
+        return events
+    
+    def _walk_ical_events(self, ical_data: str) -> List[Dict[str, Any]]:
+        """Same as _scan_ical_events, via a full icalendar parse"""
+        import icalendar
+        
         cal = icalendar.Calendar.from_ical(ical_data)
-        bookings = {}
+        events = []
         
         for component in cal.walk():
             if component.name == "VEVENT":
-                try:
-                    # Get summary FIRST to check if this is a blocked date
-                    summary = str(component.get("SUMMARY", "Guest"))
-                    
-                    # Skip blocked dates and non-reservation events EARLY
-                    # These include "Not available", "Airbnb (Not available)", etc.
-                    summary_lower = summary.lower()
-                    if ("not available" in summary_lower or 
-                        "blocked" in summary_lower or
-                        summary_lower.strip() == "airbnb" or
-                        summary_lower.startswith("airbnb (")):
-                        continue
-                    
-                    booking_id = str(component.get("UID", "unknown"))
-                    start = component.get("DTSTART").dt
-                    end = component.get("DTEND").dt
-                    
-                    # Clean guest name (after we know it's a real reservation)
-                    guest = summary.split(":")[-1].split("(")[0].strip() or "Guest"
-                    
-                    # Extract info from description
-                    description = str(component.get("DESCRIPTION", ""))
-                    phone_last4 = self._extract_phone_last4(description)
-                    reservation_id = self._extract_reservation_id(description)
-                    
-                    # Use phone last 4 as code, fallback to generated code
-                    # Note: We don't log here to avoid spam - logging happens in process_changes
-                    if phone_last4:
-                        code = phone_last4
-                    else:
-                        # Generate unique code as fallback
-                        code_seed = f"{booking_id}{start}{guest}"                    
-                        code = hashlib.md5(code_seed.encode()).hexdigest()[:4]
-                        code = str(int(code, 16))[:4]  # Ensure numeric
-                    
-                    booking = {
-                        "guest_name": guest,
-                        "reservation_id": reservation_id,
-                        "start": start.isoformat(),
-                        "end": end.isoformat(),
-                        "code": code,
-                        "phone_last4": phone_last4,
-                        "created_at": datetime.now().isoformat()
-                    }
-                    
-                    bookings[booking_id] = booking
-                    
-                except Exception as e:
-                    self.log(f"⚠️  Skipping malformed booking: {e}")
+                props: Dict[str, Any] = {}
+                for name in ("SUMMARY", "UID", "DESCRIPTION"):
+                    if name in component:
+                        props[name] = str(component.get(name))
+                for name in ("DTSTART", "DTEND"):
+                    if component.get(name) is not None:
+                        props[name] = component.get(name).dt
+                events.append(props)
+        
+        return events
+    
+    def _parse_ical(self, ical_data: str) -> Dict[str, Dict[str, Any]]:
+        """Parse iCal data into structured bookings"""
+        events = self._scan_ical_events(ical_data)
+        if events is None:
+            events = self._walk_ical_events(ical_data)
+        bookings = {}
+        now_iso = datetime.now().isoformat()  # One "observed at" time for the whole parse
+        
+        for props in events:
+            try:
+                # Get summary FIRST to check if this is a blocked date
+                summary = props.get("SUMMARY", "Guest")
+                
+                # Skip blocked dates and non-reservation events EARLY
+                # (already dropped by _scan_ical_events on the fast path)
+                if _is_blocked_summary(summary):
+                    continue
+                
+                booking_id = props.get("UID", "unknown")
+                start = props["DTSTART"]
+                end = props["DTEND"]
+                
+                # Clean guest name (after we know it's a real reservation)
+                guest = summary.rpartition(":")[2].partition("(")[0].strip() or "Guest"
+                
+                # Extract info from description
+                description = props.get("DESCRIPTION", "")
+                phone_last4 = self._extract_phone_last4(description)
+                reservation_id = self._extract_reservation_id(description)
+                
+                # Use phone last 4 as code, fallback to generated code
+                # Note: We don't log here to avoid spam - logging happens in process_changes
+                if phone_last4:
+                    code = phone_last4
+                else:
+                    # Generate unique code as fallback. Keep MD5 so codes
+                    # already on the lock stay stable; int of the first
+                    # 2 digest bytes == int(hexdigest()[:4], 16)
+                    code_seed = f"{booking_id}{start}{guest}"
+                    digest = hashlib.md5(code_seed.encode(), usedforsecurity=False).digest()
+                    code = str(int.from_bytes(digest[:2], 'big'))[:4]  # Ensure numeric
+                
+                booking = {
+                    "guest_name": guest,
+                    "reservation_id": reservation_id,
+                    "start": start.isoformat(),
+                    "end": end.isoformat(),
+                    "code": code,
+                    "phone_last4": phone_last4,
+                    "created_at": now_iso
+                }
+                
+                bookings[booking_id] = booking
+                
+            except Exception as e:
+                self.log(f"⚠️  Skipping malformed booking: {e}")
         
         return bookings
     
@@ -384,7 +678,8 @@ class AirbnbWyzeSync:
         - extensions: dates extended
         - date_changes: date modifications (earlier or different dates)
         """
-        prev_ids = set(previous.get("bookings", {}).keys())
+        previous_bookings = previous.get("bookings", {})
+        prev_ids = set(previous_bookings.keys())
         curr_ids = set(current.keys())
         
         changes = {
@@ -396,37 +691,47 @@ class AirbnbWyzeSync:
         
         # Cancellations
         for booking_id in prev_ids - curr_ids:
-            changes["cancellations"].append(previous["bookings"][booking_id])
-            self.log(f"🗑️ Cancellation: {previous['bookings'][booking_id]['guest_name']}")
+            changes["cancellations"].append(previous_bookings[booking_id])
+            self.log(f"🗑️ Cancellation: {previous_bookings[booking_id]['guest_name']}")
         
         # New bookings
         for booking_id in curr_ids - prev_ids:
             changes["new_bookings"].append(current[booking_id])
             self.log(f"➕ New booking: {current[booking_id]['guest_name']} ({current[booking_id]['start']})")
         
-        # Changes/existing bookings
-        for booking_id in curr_ids & prev_ids:
-            prev_booking = previous["bookings"][booking_id]
+        # Changes/existing bookings: diff (id, start, end) signatures in one
+        # set operation so unchanged bookings never reach the Python loop
+        prev_sigs = {(bid, b["start"], b["end"]) for bid, b in previous_bookings.items()}
+        curr_sigs = {(bid, b["start"], b["end"]) for bid, b in current.items()}
+        changed_ids = {bid for bid, _, _ in curr_sigs - prev_sigs} & prev_ids
+        
+        for booking_id in changed_ids:
+            prev_booking = previous_bookings[booking_id]
             curr_booking = current[booking_id]
             
-            if (prev_booking["start"] != curr_booking["start"] or 
-                prev_booking["end"] != curr_booking["end"]):
-                
-                prev_end = datetime.fromisoformat(prev_booking["end"])
-                curr_end = datetime.fromisoformat(curr_booking["end"])
-                
-                if curr_end > prev_end:
-                    changes["extensions"].append({"before": prev_booking, "after": curr_booking})
-                    self.log(f"✏️ Extension: {curr_booking['guest_name']} {prev_end.strftime('%m/%d')} → {curr_end.strftime('%m/%d')}")
-                else:
-                    changes["date_changes"].append({"before": prev_booking, "after": curr_booking})
-                    self.log(f"✏️ Date change: {curr_booking['guest_name']} modified dates")
+            prev_end = prev_booking["end"]
+            curr_end = curr_booking["end"]
+            
+            # We wrote these with isoformat(): same length and same UTC offset
+            # suffix means plain string order == chronological order
+            if len(prev_end) == len(curr_end) and prev_end[19:] == curr_end[19:]:
+                extended = curr_end > prev_end
+            else:
+                extended = datetime.fromisoformat(curr_end) > datetime.fromisoformat(prev_end)
+            
+            if extended:
+                changes["extensions"].append({"before": prev_booking, "after": curr_booking})
+                self.log(f"✏️ Extension: {curr_booking['guest_name']} {prev_end[5:7]}/{prev_end[8:10]} → {curr_end[5:7]}/{curr_end[8:10]}")
+            else:
+                changes["date_changes"].append({"before": prev_booking, "after": curr_booking})
+                self.log(f"✏️ Date change: {curr_booking['guest_name']} modified dates")
         
         return changes
     
     def process_changes(self, changes: Dict[str, List[Dict[str, Any]]]):
         """Apply detected changes to Wyze lock"""
-        total_changes = sum(len(v) for v in changes.values())
+        total_changes = (len(changes["cancellations"]) + len(changes["new_bookings"]) +
+                         len(changes["extensions"]) + len(changes["date_changes"]))
         
         if total_changes == 0:
             return
@@ -453,70 +758,88 @@ class AirbnbWyzeSync:
             self.log("   Codes NOT updated. Fix Wyze credentials in .env file")
             return
         
-        # Handle cancellations first
-        for booking in changes["cancellations"]:
-            lock.remove_code(booking["code"], booking["guest_name"])
-            self.send_whatsapp_notification(f"🗑️ Cancelled: Removed code {booking['code']} for {booking['guest_name']}")
-        
-        # Handle new bookings
-        for booking in changes["new_bookings"]:
-            try:
-                # Log the code type for new bookings
-                is_phone_based = booking.get("phone_last4") is not None
-                if is_phone_based:
-                    self.log(f"📱 Using phone last 4 for {booking['guest_name']}: {booking['code']}")
-                else:
-                    self.log(f"⚠️  No phone for {booking['guest_name']}, using generated code: {booking['code']}")
-                
-                lock.add_code(
-                    booking["code"], 
-                    booking["guest_name"], 
-                    booking.get("reservation_id"),
-                    booking["start"], 
-                    booking["end"]
-                )
-                
-                # Send WhatsApp notification
-                code_type = "📱 Phone-based" if is_phone_based else "⚠️ GENERATED (notify guest!)"
-                dates = f"{booking['start'][:10]} to {booking['end'][:10]}"
-                message = f"🔑 New lock code for {booking['guest_name']}\nCode: {booking['code']}\nDates: {dates}\nType: {code_type}"
+        # Wyze calls are independent HTTPS round-trips - overlap them within
+        # each phase (capped at 4 in flight, like cleanup), then notify in
+        # booking order. Phases still run in order: cancellations free codes
+        # that new bookings may reuse.
+        with ThreadPoolExecutor(max_workers=1 if self.serial else 4) as pool:
+            # Handle cancellations first
+            for message in pool.map(lambda b: self._cancel_booking(lock, b), changes["cancellations"]):
                 self.send_whatsapp_notification(message)
-                
-            except Exception as e:
-                if "duplicate" in str(e).lower() or "already exists" in str(e).lower():
-                    self.log(f"⚠️  Code {booking['code']} already exists, skipping")
-                else:
-                    raise
+            
+            # Handle new bookings
+            for message in pool.map(lambda b: self._add_booking(lock, b), changes["new_bookings"]):
+                if message:
+                    self.send_whatsapp_notification(message)
+            
+            # Handle extensions/date changes
+            updates = changes["extensions"] + changes["date_changes"]
+            for message in pool.map(lambda c: self._update_booking(lock, c), updates):
+                if message:
+                    self.send_whatsapp_notification(message)
+    
+    def _cancel_booking(self, lock, booking: Dict[str, Any]) -> str:
+        """Remove a cancelled booking's code; returns the notification"""
+        lock.remove_code(booking["code"], booking["guest_name"])
+        return f"🗑️ Cancelled: Removed code {booking['code']} for {booking['guest_name']}"
+    
+    def _add_booking(self, lock, booking: Dict[str, Any]) -> Optional[str]:
+        """Add a new booking's code; returns the notification (None if skipped)"""
+        try:
+            # Log the code type for new bookings
+            is_phone_based = booking.get("phone_last4") is not None
+            if is_phone_based:
+                self.log(f"📱 Using phone last 4 for {booking['guest_name']}: {booking['code']}")
+            else:
+                self.log(f"⚠️  No phone for {booking['guest_name']}, using generated code: {booking['code']}")
+            
+            lock.add_code(
+                booking["code"], 
+                booking["guest_name"], 
+                booking.get("reservation_id"),
+                date.fromisoformat(booking["start"][:10]),
+                date.fromisoformat(booking["end"][:10])
+            )
+            
+            # WhatsApp notification
+            code_type = "📱 Phone-based" if is_phone_based else "⚠️ GENERATED (notify guest!)"
+            dates = f"{booking['start'][:10]} to {booking['end'][:10]}"
+            return f"🔑 New lock code for {booking['guest_name']}\nCode: {booking['code']}\nDates: {dates}\nType: {code_type}"
+            
+        except Exception as e:
+            if "duplicate" in str(e).lower() or "already exists" in str(e).lower():
+                self.log(f"⚠️  Code {booking['code']} already exists, skipping")
+                return None
+            raise
+    
+    def _update_booking(self, lock, change: Dict[str, Any]) -> Optional[str]:
+        """Re-add an extended/changed booking's code; returns the notification"""
+        # Remove old code
+        lock.remove_code(change["before"]["code"], change["before"]["guest_name"])
         
-        # Handle extensions/date changes
-        for change in (changes["extensions"] + changes["date_changes"]):
-            # Remove old code
-            lock.remove_code(change["before"]["code"], change["before"]["guest_name"])
+        # Add with new dates
+        try:
+            lock.add_code(
+                change["after"]["code"],
+                change["after"]["guest_name"], 
+                change["after"].get("reservation_id"),
+                date.fromisoformat(change["after"]["start"][:10]),
+                date.fromisoformat(change["after"]["end"][:10])
+            )
             
-            # Add with new dates
-            try:
-                lock.add_code(
-                    change["after"]["code"],
-                    change["after"]["guest_name"], 
-                    change["after"].get("reservation_id"),
-                    change["after"]["start"],
-                    change["after"]["end"]
-                )
-                
-                # Determine if extension or change
-                is_extension = change["after"]["end"] > change["before"]["end"]
-                change_type = "Extended" if is_extension else "Modified"
-                
-                old_dates = f"{change['before']['start'][:10]} to {change['before']['end'][:10]}"
-                new_dates = f"{change['after']['start'][:10]} to {change['after']['end'][:10]}"
-                message = f"✏️ {change_type}: {change['after']['guest_name']}\nCode: {change['after']['code']}\n{old_dates} → {new_dates}"
-                self.send_whatsapp_notification(message)
-                
-            except Exception as e:
-                if "duplicate" in str(e).lower() or "already exists" in str(e).lower():
-                    self.log(f"⚠️  Code {change['after']['code']} already exists, skipping")
-                else:
-                    raise
+            # Determine if extension or change
+            is_extension = change["after"]["end"] > change["before"]["end"]
+            change_type = "Extended" if is_extension else "Modified"
+            
+            old_dates = f"{change['before']['start'][:10]} to {change['before']['end'][:10]}"
+            new_dates = f"{change['after']['start'][:10]} to {change['after']['end'][:10]}"
+            return f"✏️ {change_type}: {change['after']['guest_name']}\nCode: {change['after']['code']}\n{old_dates} → {new_dates}"
+            
+        except Exception as e:
+            if "duplicate" in str(e).lower() or "already exists" in str(e).lower():
+                self.log(f"⚠️  Code {change['after']['code']} already exists, skipping")
+                return None
+            raise
     
     def cleanup_old_codes(self):
         """Remove Wyze codes for bookings that ended more than 2 weeks ago"""
@@ -534,6 +857,7 @@ class AirbnbWyzeSync:
             
             cutoff_date = datetime.now() - timedelta(days=14)  # 2 weeks ago
             removed_count = 0
+            to_delete = []
             
             for code in codes:
                 # Check if this is one of our guest codes (starts with "Guest_")
@@ -549,17 +873,14 @@ class AirbnbWyzeSync:
                                 self.log(f"   [DRY RUN] Would remove old code '{code.name}' (expired {end_time.strftime('%Y-%m-%d')})")
                                 removed_count += 1
                                 continue
-
-                            self.log(f"🧹 Removing old code '{code.name}' (expired {end_time.strftime('%Y-%m-%d')})")
-                            try:
-                                lock.client.locks.delete_access_code(
-                                    device_mac=lock.lock_device.mac,
-                                    device_model=lock.lock_device.product.model,
-                                    access_code_id=code.id
-                                )
-                                removed_count += 1
-                            except Exception as e:
-                                self.log(f"⚠️  Failed to remove old code '{code.name}': {e}")
+                            
+                            to_delete.append((code, end_time))
+            
+            # Deletes are independent HTTPS round-trips - overlap them, capped
+            # at 4 in flight to stay under Wyze's rate limit (one at a time with --serial)
+            if to_delete:
+                with ThreadPoolExecutor(max_workers=1 if self.serial else 4) as pool:
+                    removed_count += sum(pool.map(lambda item: self._delete_old_code(lock, *item), to_delete))
             
             if removed_count > 0:
                 if self.dry_run:
@@ -573,37 +894,68 @@ class AirbnbWyzeSync:
         except Exception as e:
             self.log(f"⚠️  Cleanup failed: {e}")
     
+    def _delete_old_code(self, lock, code, end_time: datetime) -> bool:
+        """Delete one expired guest code (runs on cleanup's thread pool)"""
+        self.log(f"🧹 Removing old code '{code.name}' (expired {end_time.strftime('%Y-%m-%d')})")
+        try:
+            lock.client.locks.delete_access_code(
+                device_mac=lock.lock_device.mac,
+                device_model=lock.lock_device.product.model,
+                access_code_id=code.id
+            )
+            return True
+        except Exception as e:
+            self.log(f"⚠️  Failed to remove old code '{code.name}': {e}")
+            return False
+    
     def sync(self):
         """Main sync function - runs every 15 minutes"""
-        # Check API key expiration first
-        self.check_api_key_expiration()
-        
+        # State first: the fetch needs its ETag/Last-Modified
         state = self.load_bookings_state()
-        previous_bookings = state.get("bookings", {})
         
         self.log("🔄 Starting booking sync...")
         
-        current_bookings = self.fetch_current_bookings()
+        # Codes on the lock may have changed since a previous sync() call
+        if self.lock_api is not None:
+            self.lock_api.invalidate_codes()
+        
+        # Check API key expiration while the iCal download is in flight -
+        # they're independent, and the fetch is mostly network wait
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            fetch = pool.submit(self.fetch_current_bookings, state)
+            self.check_api_key_expiration()
+            current_bookings = fetch.result()
+        
         if not current_bookings:
             return
         
+        if self._ical_not_modified:
+            # Same feed as last time - no lock changes, cleanup waits for
+            # the daily full sync
+            self.log("📭 iCal not modified since last sync")
+            return
+        
         changes = self.detect_changes(state, current_bookings)
         
-        if not any(changes.values()):
-            self.log("✅ No booking changes detected")
-        else:
-            self.process_changes(changes)
+        # One WhatsApp message per run instead of one per change
+        with self.batched_notifications():
+            if not (changes["cancellations"] or changes["new_bookings"] or
+                    changes["extensions"] or changes["date_changes"]):
+                self.log("✅ No booking changes detected")
+            else:
+                self.process_changes(changes)
+                
+                summary = f"Changes: {len(changes['cancellations'])}✂️  {len(changes['new_bookings'])}➕ {len(changes['extensions'])}✏️ {len(changes['date_changes'])}📅"
+                self.log(summary)
             
-            summary = f"Changes: {len(changes['cancellations'])}✂️  {len(changes['new_bookings'])}➕ {len(changes['extensions'])}✏️ {len(changes['date_changes'])}📅"
-            self.log(summary)
-        
-        # Clean up old codes (runs every time, but only removes codes > 2 weeks old)
-        self.cleanup_old_codes()
+            # Clean up old codes (runs every time, but only removes codes > 2 weeks old)
+            self.cleanup_old_codes()
         
         # Save updated state
         new_state = {
             "bookings": current_bookings,
-            "last_sync": datetime.now().isoformat()
+            "last_sync": datetime.now().isoformat(),
+            **self._ical_validators
         }
         self.save_bookings_state(new_state)
 
@@ -615,13 +967,29 @@ class WyzeLockAPI:
         self.config = config
         self.client = None
         self.lock_device = None
+        self._lock_mac = None  # lock_device.mac / .product.model, set once the lock is found
+        self._lock_model = None
+        
+        # Check-in/check-out times and code buffers, read once per run
+        self._check_in_time = config['check_in_time']  # datetime.time, parsed by _load_config
+        self._check_out_time = config['check_out_time']
+        self._activation_delta = timedelta(minutes=config.get('activation_buffer_minutes', 5))
+        self._expiration_delta = timedelta(minutes=config.get('expiration_buffer_minutes', 15))
+        self._code_index = None  # {code: [access code ids]}, see _get_codes_cached()
+        self._codes_lock = threading.Lock()  # process_changes calls in from a thread pool
+        self._last_ts_sec = 0  # log() reuses the timestamp within a second
+        self._last_ts_str = ""
+        
+        # Lock's timezone
+        self._tz = _get_zone(config.get('timezone', 'America/Chicago'))
+        
         self._authenticate()
     
     def _authenticate(self):
         """Authenticate with Wyze API using API Key (required since July 2023)"""
         try:
+            _import_wyze_sdk()
             from wyze_sdk import Client
-            from wyze_sdk.errors import WyzeApiError
             
             email = self.config.get('wyze_email')
             password = self.config.get('wyze_password')
@@ -659,8 +1027,6 @@ class WyzeLockAPI:
     
     def _find_lock_device(self):
         """Find the lock device by MAC or name"""
-        from wyze_sdk.errors import WyzeApiError
-        
         target_mac = self.config.get('lock_device_mac', '').lower()
         target_name = self.config.get('device_name', '')
         
@@ -670,11 +1036,11 @@ class WyzeLockAPI:
                 if device.product.model == 'YD.LO1':  # Wyze Lock model
                     device_mac = device.mac.lower()
                     if target_mac and target_mac in device_mac:
-                        self.lock_device = device
+                        self._set_lock_device(device)
                         self.log(f"🔒 Found lock by MAC: {device.nickname}")
                         return
                     elif target_name and target_name.lower() in device.nickname.lower():
-                        self.lock_device = device
+                        self._set_lock_device(device)
                         self.log(f"🔒 Found lock by name: {device.nickname}")
                         return
             
@@ -684,60 +1050,34 @@ class WyzeLockAPI:
         except WyzeApiError as e:
             raise RuntimeError(f"Failed to list devices: {e}")
     
-    def add_code(self, code: str, guest_name: str, reservation_id: Optional[str], start_iso: str, end_iso: str):
+    def _set_lock_device(self, device):
+        """Remember the lock and the identifiers every API call passes"""
+        self.lock_device = device
+        self._lock_mac = device.mac
+        self._lock_model = device.product.model
+    
+    def add_code(self, code: str, guest_name: str, reservation_id: Optional[str], start_date: date, end_date: date):
         """Add temporary access code to Wyze lock with timezone support"""
-        from wyze_sdk.errors import WyzeApiError
-        
-        # Get timezone setting
-        tz_name = self.config.get('timezone', 'America/Chicago')
-        try:
-            import pytz
-            tz = pytz.timezone(tz_name)
-        except ImportError:
-            self.log("⚠️  pytz not installed, using UTC. Install with: pip install pytz")
-            tz = None
-        
-        # Parse dates from iCal (these are dates only, no time)
-        start_date = datetime.fromisoformat(start_iso).date()
-        end_date = datetime.fromisoformat(end_iso).date()
-        
-        # Get check-in/check-out times from config
-        check_in_time = self.config.get('check_in_time', '16:00')
-        check_out_time = self.config.get('check_out_time', '11:00')
+        tz = self._tz
         
-        # Parse times
-        check_in_hour, check_in_min = map(int, check_in_time.split(':'))
-        check_out_hour, check_out_min = map(int, check_out_time.split(':'))
-        
-        # Combine date + time, then apply timezone
-        check_in_dt = datetime(start_date.year, start_date.month, start_date.day, 
-                               check_in_hour, check_in_min)
-        check_out_dt = datetime(end_date.year, end_date.month, end_date.day,
-                                check_out_hour, check_out_min)
-        
-        # Localize to lock's timezone
-        if tz:
-            check_in_dt = tz.localize(check_in_dt)
-            check_out_dt = tz.localize(check_out_dt)
-            self.log(f"   Lock timezone: {tz_name}")
+        # Combine date + check-in/check-out time in the lock's timezone
+        check_in_dt = datetime.combine(start_date, self._check_in_time, tzinfo=tz)
+        check_out_dt = datetime.combine(end_date, self._check_out_time, tzinfo=tz)
         
         # Add buffers: X min before check-in, X minutes after check-out
-        buffer_minutes = self.config.get('activation_buffer_minutes', 5)
-        expiration_minutes = self.config.get('expiration_buffer_minutes', 15)
-        active_start = check_in_dt - timedelta(minutes=buffer_minutes)
-        active_end = check_out_dt + timedelta(minutes=expiration_minutes)
+        active_start = check_in_dt - self._activation_delta
+        active_end = check_out_dt + self._expiration_delta
+        active_window = f"{active_start.strftime('%m/%d %H:%M')} - {active_end.strftime('%m/%d %H:%M')}"
         
-        # Log the times
-        if tz:
-            self.log(f"   Check-in: {check_in_dt.strftime('%Y-%m-%d %H:%M %Z')}")
-            self.log(f"   Check-out: {check_out_dt.strftime('%Y-%m-%d %H:%M %Z')}")
+        # Log the times (one call, one timestamp)
+        self.log(f"   Lock timezone: {tz.key}\n"
+                 f"   Check-in: {check_in_dt.strftime('%Y-%m-%d %H:%M %Z')}\n"
+                 f"   Check-out: {check_out_dt.strftime('%Y-%m-%d %H:%M %Z')}")
         
         # Generate a unique access code name
         code_name = f"Guest_{code}"
         
         try:
-            from wyze_sdk.models.devices.locks import LockKeyPermission, LockKeyPermissionType
-            
             # Create permission with begin/end times (DURATION = temporary code)
             permission = LockKeyPermission(
                 type=LockKeyPermissionType.DURATION,
@@ -747,55 +1087,82 @@ class WyzeLockAPI:
             
             # Create the access code using correct API signature
             self.client.locks.create_access_code(
-                device_mac=self.lock_device.mac,
+                device_mac=self._lock_mac,
                 access_code=code,
                 name=code_name,
                 permission=permission
             )
-            self.log(f"🔓 Added code {code} for {guest_name}")
-            self.log(f"   Active: {active_start.strftime('%m/%d %H:%M')} - {active_end.strftime('%m/%d %H:%M')}")
+            self.invalidate_codes()  # New code's id is only known to Wyze
+            self.log(f"🔓 Added code {code} for {guest_name}\n   Active: {active_window}")
                 
         except Exception as e:
             # Log the error but don't crash - allows debugging
             self.log(f"⚠️  Wyze API error: {e}")
             self.log(f"   Would have added code {code} for {guest_name}")
-            self.log(f"   Active: {active_start.strftime('%m/%d %H:%M')} - {active_end.strftime('%m/%d %H:%M')}")
+            self.log(f"   Active: {active_window}")
     
     def remove_code(self, code: str, guest_name: str):
         """Remove access code from Wyze lock"""
-        from wyze_sdk.errors import WyzeApiError
-        
         try:
-            # Get all access codes for the lock
-            codes = self.client.locks.get_access_codes(
-                device_mac=self.lock_device.mac,
-                device_model=self.lock_device.product.model
-            )
+            # All access codes for the lock (fetched once per sync)
+            code_index = self._get_codes_cached()
             
-            # Find and delete the matching code
-            deleted = False
-            for access_code in codes:
-                if access_code.code == code:
-                    self.client.locks.delete_access_code(
-                        device_mac=self.lock_device.mac,
-                        device_model=self.lock_device.product.model,
-                        access_code_id=access_code.id
-                    )
-                    self.log(f"🔒 Removed code {code} for {guest_name}")
-                    deleted = True
-                    break
+            # Claim the matching code (first of any duplicates - returning
+            # guests reuse their phone last-4) before the HTTP delete, so
+            # concurrent removals of the same code never delete one id twice
+            with self._codes_lock:
+                ids = code_index.get(code)
+                access_code_id = ids.pop(0) if ids else None
             
-            if not deleted:
+            if access_code_id is None:
                 self.log(f"⚠️  Code {code} not found on lock (may have expired)")
+            else:
+                try:
+                    self.client.locks.delete_access_code(
+                        device_mac=self._lock_mac,
+                        device_model=self._lock_model,
+                        access_code_id=access_code_id
+                    )
+                except WyzeApiError:
+                    # Still on the lock - give the id back
+                    with self._codes_lock:
+                        ids.insert(0, access_code_id)
+                    raise
+                self.log(f"🔒 Removed code {code} for {guest_name}")
                 
         except WyzeApiError as e:
             self.log(f"❌ Failed to remove code {code}: {e}")
             raise
     
+    def invalidate_codes(self):
+        """Drop the cached code index so the next lookup refetches it"""
+        with self._codes_lock:
+            self._code_index = None
+    
+    def _get_codes_cached(self) -> Dict[str, List[Any]]:
+        """Lock's access codes as {code: [ids]}, fetched once and reused until a code is added"""
+        with self._codes_lock:
+            if self._code_index is None:
+                codes = self.client.locks.get_access_codes(
+                    device_mac=self._lock_mac,
+                    device_model=self._lock_model
+                )
+                # Ids in lock order, so removals take the first match like the
+                # old linear scan; duplicates are removed one per call
+                self._code_index = {}
+                for access_code in codes:
+                    self._code_index.setdefault(access_code.code, []).append(access_code.id)
+            return self._code_index
+    
     def log(self, message: str):
         """Log message (passed to main logger)"""
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        print(f"{timestamp} - {message}")
+        now = int(time.time())
+        if now != self._last_ts_sec:
+            self._last_ts_str = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(now))
+            self._last_ts_sec = now
+        # One write per line; stdout is already block-buffered by io when it
+        # isn't a terminal (cron), so this doesn't hit the fd per message
+        sys.stdout.write(f"{self._last_ts_str} - {message}\n")
 
 
 def main():
@@ -807,6 +1174,7 @@ def main():
 Examples:
   python sync.py              # Normal sync (runs every 15 min via cron)
   python sync.py --dry-run    # Preview changes without modifying lock
+  python sync.py --serial     # Apply lock changes one at a time (debugging)
         """
     )
     parser.add_argument(
@@ -814,10 +1182,15 @@ Examples:
         action='store_true',
         help='Preview changes without modifying the Wyze lock'
     )
+    parser.add_argument(
+        '--serial',
+        action='store_true',
+        help='Apply lock changes one at a time instead of concurrently (for debugging)'
+    )
     args = parser.parse_args()
     
     try:
-        sync = AirbnbWyzeSync(dry_run=args.dry_run)
+        sync = AirbnbWyzeSync(dry_run=args.dry_run, serial=args.serial)
         sync.sync()
     except KeyboardInterrupt:
         print("\nGracefully stopped")
@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 """Test script to verify the sync setup is working properly"""
+import importlib.util
 import os
 import sys
 from pathlib import Path
@@ -8,15 +9,15 @@ from pathlib import Path
 current_dir = Path(__file__).parent
 sys.path.insert(0, str(current_dir))
 
-# Test imports
-try:
-    import requests
-    import icalendar
-    from dotenv import load_dotenv
-    print("✅ All Python dependencies available")
-except ImportError as e:
-    print(f"❌ Missing dependency: {e}")
-    sys.exit(1)
+# Test dependencies are installed (find_spec locates them without running
+# their import-time code - icalendar in particular is slow to import)
+for module in ("requests", "icalendar", "dotenv"):
+    if importlib.util.find_spec(module) is None:
+        print(f"❌ Missing dependency: {module}")
+        sys.exit(1)
+print("✅ All Python dependencies available")
+
+from dotenv import load_dotenv
 
 # Test environment
 try: